@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Exporta una tabla DynamoDB a CSV con filtro de fechas y orden configurable.
+Exporta una tabla DynamoDB a CSV (o NDJSON) con filtro de fechas y orden configurable.
 Requisitos:
     pip install boto3
 
@@ -9,43 +9,118 @@ Ejemplos
   python dynamo_query.py --table QR_TRANSACTION --order desc --sort-by created_date
   python dynamo_query.py --table QR_TRANSACTION --order desc --sort-by created_date
   python dynamo_query.py --table QR_CUSTOMER --order desc --sort-by created_date
+  python dynamo_query.py --table QR_TRANSACTION --date-attr created_date \
+      --partition document_number=123 --start-date 2024-01-01
 """
 
 import argparse
+import base64
 import csv
 import json
+import math
+import pickle
+import queue
 import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from decimal import Decimal
-from typing import Any, Dict, List, Optional, Set
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import boto3
-from boto3.dynamodb.conditions import Attr
+from botocore.config import Config
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import Binary
+
+
+# Máximo de segmentos (y hilos) del Scan paralelo.
+MAX_SEGMENTS = 32
+
+# Espera máxima de cada put()/get() sobre la cola de páginas del Scan.
+QUEUE_POLL_SECONDS = 0.1
+
+# Filas que se acumulan antes de cada writer.writerows().
+CSV_BATCH_ROWS = 1000
 
 
 # ------------------------- Argumentos CLI ------------------------- #
+def parse_partition(value: str) -> Tuple[str, str]:
+    attr, sep, raw = value.partition("=")
+    if not sep or not attr:
+        raise argparse.ArgumentTypeError("formato esperado ATTR=VALOR")
+    return attr, raw
+
+
+def positive_int(value: str) -> int:
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError("debe ser un entero mayor o igual que 1")
+    return n
+
+
+def positive_float(value: str) -> float:
+    x = float(value)
+    if not x > 0:
+        raise argparse.ArgumentTypeError("debe ser un número mayor que 0")
+    return x
+
+
 def parse_arguments() -> argparse.Namespace:
-    p = argparse.ArgumentParser(description="Exporta DynamoDB a CSV.")
+    p = argparse.ArgumentParser(description="Exporta DynamoDB a CSV (o NDJSON).")
     p.add_argument("--table", required=True, help="Nombre de la tabla DynamoDB.")
     p.add_argument("--start-date", help="Fecha inicio (YYYY-MM-DD o ISO 8601).")
     p.add_argument("--end-date", help="Fecha fin    (YYYY-MM-DD o ISO 8601).")
     p.add_argument("--date-attr", default="created_at",
                    help="Atributo fecha usado en el filtro (def: created_at).")
     p.add_argument("--stdout", action="store_true",
-                   help="Imprime CSV en stdout en vez de archivo.")
+                   help="Imprime el CSV (o NDJSON) en stdout en vez de archivo.")
+    p.add_argument("--ndjson", action="store_true",
+                   help="Exporta NDJSON (un objeto JSON por línea) en vez de CSV.")
     p.add_argument("--profile", help="Perfil AWS.")
     p.add_argument("--region", help="Región AWS.")
     p.add_argument("--delimiter", default=",", help="Delimitador CSV (def: ,).")
+    p.add_argument("--partition", type=parse_partition, metavar="ATTR=VALOR",
+                   help="Valor de la partition key; si --date-attr es la sort "
+                        "key de la tabla o de un índice se usa Query en vez "
+                        "de Scan; si no, el Scan se filtra por ese valor.")
+    p.add_argument("--columns", nargs="+",
+                   help="Columnas a exportar (lista o cadena separada por "
+                        "comas); solo se descargan esos atributos.")
+    p.add_argument("--rcu-cap", type=positive_float,
+                   help="Máximo de RCU por segundo entre todos los segmentos "
+                        "del Scan (tablas con capacidad provisionada).")
+    p.add_argument("--segments", type=positive_int,
+                   help="Segmentos del Scan paralelo (def: 1 por MB de tabla, "
+                        f"máx. {MAX_SEGMENTS}).")
 
     # Ordenación
     p.add_argument("--sort-by", default="created_date",
                    help="Atributo por el que ordenar (def: created_date).")
-    p.add_argument("--order", choices=["asc", "desc"], default="asc",
-                   help="Orden asc o desc (def: asc).")
+    p.add_argument("--order", choices=["asc", "desc", "none"], default="asc",
+                   help="Orden asc, desc o none; con none las páginas se "
+                        "escriben según llegan sin cargar la tabla en "
+                        "memoria (def: asc).")
     return p.parse_args()
 
 
 # ------------------------- Utilidades ------------------------- #
+def parse_columns(column_args: List[str]) -> List[str]:
+    """['a,b', 'c', 'a'] ➜ ['a', 'b', 'c'] (sin duplicados, en orden)."""
+    cols = (c.strip() for arg in column_args for c in arg.split(","))
+    return list(dict.fromkeys(c for c in cols if c))
+
+
+def add_projection(kwargs: Dict[str, Any], columns: List[str]) -> None:
+    """Añade a kwargs de Scan/Query una ProjectionExpression con columns."""
+    names = {f"#c{i}": col for i, col in enumerate(columns)}
+    kwargs["ProjectionExpression"] = ", ".join(names)
+    kwargs.setdefault("ExpressionAttributeNames", {}).update(names)
+
+
 def iso_to_timestamp_ms(date_str: str) -> int:
     dt = datetime.fromisoformat(date_str)
     if dt.tzinfo is None:
@@ -67,7 +142,7 @@ def value_as_sort_key(val: Any) -> Any:
 
     # Decimal ➜ numérico
     if isinstance(val, Decimal):
-        val = int(val) if val % 1 == 0 else float(val)
+        val = int(val) if val == val.to_integral_value() else float(val)
 
     # Numérico (int/float)  ➜ tipo 0
     if isinstance(val, (int, float)):
@@ -75,86 +150,453 @@ def value_as_sort_key(val: Any) -> Any:
 
     # String: fecha ISO o número
     if isinstance(val, str):
-        # fecha ISO
-        try:
-            dt = datetime.fromisoformat(val)
-            if dt.tzinfo is None:
-                dt = dt.replace(tzinfo=timezone.utc)
-            return (0, dt.timestamp())        # tipo 0  ➜ numérico
-        except ValueError:
-            pass
-        # número
-        try:
-            return (0, float(val))            # tipo 0  ➜ numérico
-        except ValueError:
-            pass
-        # cualquier otro string ➜ tipo 1
-        return (1, val)
+        return _str_sort_key(val)
 
     # Último recurso: serializar a string (tipo 1)
     return (1, str(val))
 
 
-def to_scalar(val: Any) -> Any:
-    if isinstance(val, Decimal):
-        return int(val) if val % 1 == 0 else float(val)
-    if isinstance(val, (dict, list)):
-        return json.dumps(val, ensure_ascii=False)
+@lru_cache(maxsize=1 << 16)
+def _str_sort_key(val: str) -> Tuple[int, Any]:
+    """
+    Parte string de value_as_sort_key. Va cacheada porque las columnas de
+    fecha repiten mucho los mismos valores y fromisoformat (y la excepción
+    cuando falla) es lo más caro de la clave de orden.
+    """
+    # fecha ISO
+    try:
+        dt = datetime.fromisoformat(val)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return (0, dt.timestamp())        # tipo 0  ➜ numérico
+    except ValueError:
+        pass
+    # número
+    try:
+        return (0, float(val))            # tipo 0  ➜ numérico
+    except ValueError:
+        pass
+    # cualquier otro string ➜ tipo 1
+    return (1, val)
+
+
+def sort_items(items: List[Dict[str, Any]], sort_attr: str, reverse: bool) -> None:
+    """
+    Ordena in situ por sort_attr. Si todos los valores son int o float (lo
+    habitual con epoch), se ordena por el valor tal cual, sin tuplas
+    (tipo, valor): con un solo tipo CPython usa una comparación
+    especializada en C, y int/float mezclados se comparan de forma exacta.
+    Si no, value_as_sort_key.
+    """
+    vals = [it.get(sort_attr) for it in items]
+    types = set(map(type, vals))
+    if not types or not types <= {int, float}:
+        items.sort(key=lambda it: value_as_sort_key(it.get(sort_attr)), reverse=reverse)
+        return
+    order = sorted(range(len(items)), key=vals.__getitem__, reverse=reverse)
+    items[:] = [items[i] for i in order]
+
+
+def _json_default(obj: Any) -> Any:
+    """Hook de json.dumps para los tipos de DynamoDB (binarios ➜ base64)."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, set):
+        return list(obj)
+    if isinstance(obj, Binary):
+        obj = obj.value
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode("ascii")
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+# Encoder compacto para celdas Map/List y NDJSON, creado una sola vez: json.dumps
+# con argumentos no por defecto construye un JSONEncoder nuevo en cada llamada.
+_encode_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"),
+                                default=_json_default).encode
+
+
+def to_scalar(val: Any, _isinstance=isinstance, _Decimal=Decimal,
+              _containers=(dict, list), _encode=_encode_json) -> Any:
+    # Los argumentos _* son globales ligados como locales: se llama por celda.
+    if _isinstance(val, _Decimal):
+        return int(val) if val == val.to_integral_value() else float(val)
+    if _isinstance(val, _containers):
+        return _encode(val)
     return val
 
 
+@lru_cache(maxsize=None)
 def get_dynamodb_resource(profile: Optional[str], region: Optional[str]):
+    """Una sola Session/resource (y pool de conexiones) por perfil y región."""
     session = boto3.Session(profile_name=profile) if profile else boto3.Session()
-    return session.resource("dynamodb", region_name=region) if region else session.resource("dynamodb")
+    # Un socket keep-alive por segmento del Scan paralelo (el pool por
+    # defecto es de 10) y reintentos adaptativos ante throttling.
+    config = Config(
+        max_pool_connections=MAX_SEGMENTS,
+        retries={"max_attempts": 10, "mode": "adaptive"},
+        tcp_keepalive=True,
+    )
+    if region:
+        return session.resource("dynamodb", region_name=region, config=config)
+    return session.resource("dynamodb", config=config)
+
+
+def date_condition(attr, start_ts: Optional[int], end_ts: Optional[int]):
+    """Rango de fechas como condición de clave (Key) para Query."""
+    if start_ts and end_ts:
+        return attr.between(start_ts, end_ts)
+    if start_ts:
+        return attr.gte(start_ts)
+    if end_ts:
+        return attr.lte(end_ts)
+    return None
 
 
-# ------------------------- DynamoDB Scan ------------------------- #
-def scan_table(
-    table_name: str,
+# ------------------------- DynamoDB Query ------------------------- #
+def query_index(table, partition_attr: str,
+                date_attr: str) -> Optional[Dict[str, Any]]:
+    """
+    Busca en el key schema de la tabla y de sus índices uno con
+    HASH = partition_attr y RANGE = date_attr. Devuelve los kwargs base de
+    Query ({} para la tabla, {"IndexName": ...} para un índice) o None si
+    no hay ninguno y hay que recurrir al Scan.
+    """
+    candidates = [(None, table.key_schema)]
+    for idx in (table.global_secondary_indexes or []) + (table.local_secondary_indexes or []):
+        candidates.append((idx["IndexName"], idx["KeySchema"]))
+
+    for index_name, key_schema in candidates:
+        keys = {k["KeyType"]: k["AttributeName"] for k in key_schema}
+        if keys.get("HASH") == partition_attr and keys.get("RANGE") == date_attr:
+            return {"IndexName": index_name} if index_name else {}
+    return None
+
+
+def typed_partition(table, partition: Tuple[str, str]) -> Tuple[str, Any]:
+    """
+    Convierte el valor de --partition a número si el atributo es de tipo N.
+    Los atributos que no son clave no figuran en attribute_definitions y se
+    comparan como string.
+    """
+    attr, raw_value = partition
+    attr_types = {a["AttributeName"]: a["AttributeType"]
+                  for a in table.attribute_definitions}
+    if attr_types.get(attr) != "N":
+        return attr, raw_value
+    try:
+        value = Decimal(raw_value)
+    except InvalidOperation:
+        value = None
+    if value is None or not value.is_finite():
+        raise ValueError(f"«{attr}» es numérico y «{raw_value}» no es un número.")
+    return attr, value
+
+
+def iter_query(
+    table,
+    index_kwargs: Dict[str, Any],
+    partition: Tuple[str, Any],
     date_attr: str,
     start_ts: Optional[int],
     end_ts: Optional[int],
-    dynamodb
-) -> List[Dict[str, Any]]:
-    table = dynamodb.Table(table_name)
-    scan_kwargs: Dict[str, Any] = {"ConsistentRead": False}
+    columns: Optional[List[str]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    partition_attr, value = partition
+    key_cond = Key(partition_attr).eq(value)
+    date_key = date_condition(Key(date_attr), start_ts, end_ts)
+    if date_key is not None:
+        key_cond = key_cond & date_key
+
+    kwargs = dict(index_kwargs, KeyConditionExpression=key_cond)
+    if columns:
+        add_projection(kwargs, columns)
+    while True:
+        resp = table.query(**kwargs)
+        yield resp.get("Items", [])
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        kwargs["ExclusiveStartKey"] = last_key
+
 
+# ------------------------- DynamoDB Scan ------------------------- #
+def scan_filter_kwargs(date_attr: str, start_ts: Optional[int],
+                       end_ts: Optional[int],
+                       partition: Optional[Tuple[str, Any]] = None) -> Dict[str, Any]:
+    """
+    FilterExpression ya serializada para el cliente de bajo nivel: se arma
+    una sola vez en vez de pasar por el Attr(...) del resource en cada página.
+    Con `partition` (--partition sin índice para Query) se añade #p = :p.
+    """
+    names: Dict[str, str] = {}
+    values: Dict[str, Any] = {}
+    conditions: List[str] = []
+
+    if start_ts or end_ts:
+        names["#d"] = date_attr
+    if start_ts:
+        values[":s"] = {"N": str(start_ts)}
+    if end_ts:
+        values[":e"] = {"N": str(end_ts)}
     if start_ts and end_ts:
-        scan_kwargs["FilterExpression"] = Attr(date_attr).between(start_ts, end_ts)
+        conditions.append("#d BETWEEN :s AND :e")
     elif start_ts:
-        scan_kwargs["FilterExpression"] = Attr(date_attr).gte(start_ts)
+        conditions.append("#d >= :s")
     elif end_ts:
-        scan_kwargs["FilterExpression"] = Attr(date_attr).lte(end_ts)
+        conditions.append("#d <= :e")
+
+    if partition:
+        attr, value = partition
+        names["#p"] = attr
+        values[":p"] = {"N": str(value)} if isinstance(value, Decimal) else {"S": value}
+        conditions.append("#p = :p")
+
+    if not conditions:
+        return {}
+    return {
+        "FilterExpression": " AND ".join(f"({c})" for c in conditions)
+                            if len(conditions) > 1 else conditions[0],
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+    }
+
 
-    items: List[Dict[str, Any]] = []
-    last_key = None
+def _number(s: str) -> Any:
+    return float(s) if "." in s or "e" in s or "E" in s else int(s)
+
+
+def deserialize(av: Dict[str, Any]) -> Any:
+    """
+    Convierte un AttributeValue del cliente de bajo nivel ({"S": ...},
+    {"N": ...}, ...) a Python. Los números van directos a int/float sin
+    pasar por Decimal, en el mismo recorrido que desenvuelve los tipos.
+    """
+    (tag, val), = av.items()
+    if tag == "S":
+        return val
+    if tag == "N":
+        return _number(val)
+    if tag == "M":
+        return {k: deserialize(v) for k, v in val.items()}
+    if tag == "L":
+        return [deserialize(v) for v in val]
+    if tag == "NULL":
+        return None
+    if tag == "SS" or tag == "BS":
+        return set(val)
+    if tag == "NS":
+        return {_number(n) for n in val}
+    return val          # BOOL, B
+
+
+def default_segments(table) -> int:
+    """Un segmento por MB de tabla (según DescribeTable), entre 1 y MAX_SEGMENTS."""
+    size_mb = math.ceil((table.table_size_bytes or 0) / (1024 * 1024))
+    return max(1, min(MAX_SEGMENTS, size_mb))
+
+
+class RcuThrottle:
+    """
+    Reparte un tope de RCU/s entre los hilos del Scan. Cada página se cobra
+    después de leerla (según ConsumedCapacity) y el hilo espera hasta que
+    esa deuda quede saldada al ritmo permitido. La espera se corta en
+    cuanto se activa `stop` (error en otro segmento o consumidor cerrado).
+    """
+
+    def __init__(self, rcu_per_sec: float, stop: threading.Event):
+        self.rcu_per_sec = rcu_per_sec
+        self.stop = stop
+        self._lock = threading.Lock()
+        self._free_at = time.monotonic()
+
+    def consume(self, units: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._free_at = max(self._free_at, now) + units / self.rcu_per_sec
+            delay = self._free_at - now
+        self.stop.wait(delay)
+
+
+def put_page(pages: queue.Queue, page: Optional[List[Dict[str, Any]]],
+             stop: threading.Event) -> bool:
+    """put() que no bloquea para siempre: se rinde si se ha pedido parar."""
     while True:
-        if last_key:
-            scan_kwargs["ExclusiveStartKey"] = last_key
-        resp = table.scan(**scan_kwargs)
-        items.extend(resp.get("Items", []))
-        last_key = resp.get("LastEvaluatedKey")
-        if not last_key:
-            break
-    return items
+        try:
+            pages.put(page, timeout=QUEUE_POLL_SECONDS)
+            return True
+        except queue.Full:
+            if stop.is_set():
+                return False
+
+
+def scan_segment(client, scan_kwargs: Dict[str, Any], segment: int,
+                 total_segments: int, pages: queue.Queue,
+                 stop: threading.Event,
+                 throttle: Optional[RcuThrottle] = None) -> None:
+    kwargs = dict(scan_kwargs, Segment=segment, TotalSegments=total_segments)
+    try:
+        while not stop.is_set():
+            resp = client.scan(**kwargs)
+            page = [{k: deserialize(v) for k, v in it.items()}
+                    for it in resp.get("Items", [])]
+            if not put_page(pages, page, stop):
+                break
+            if throttle:
+                throttle.consume(resp["ConsumedCapacity"]["CapacityUnits"])
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        put_page(pages, None, stop)     # fin de segmento
+
+
+def iter_scan(
+    table_name: str,
+    date_attr: str,
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+    dynamodb,
+    total_segments: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+    rcu_cap: Optional[float] = None,
+    partition: Optional[Tuple[str, Any]] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Genera los ítems página a página según los devuelve DynamoDB.
+    Cada segmento pagina en su propio hilo con el cliente de bajo nivel
+    (thread-safe, se comparte) y convierte los ítems con deserialize();
+    la cola acotada frena a los hilos si el consumidor va más lento, así
+    que en memoria solo hay unas pocas páginas.
+    """
+    client = dynamodb.meta.client
+    # Lectura eventual (por defecto): la mitad de RCU que ConsistentRead.
+    scan_kwargs: Dict[str, Any] = {"TableName": table_name}
+    scan_kwargs.update(scan_filter_kwargs(date_attr, start_ts, end_ts, partition))
+    if columns:
+        add_projection(scan_kwargs, columns)
+
+
+    # Nunca más hilos que conexiones en el pool (max_pool_connections).
+    if total_segments:
+        total_segments = min(total_segments, MAX_SEGMENTS)
+    else:
+        total_segments = default_segments(dynamodb.Table(table_name))
+
+    pages: queue.Queue = queue.Queue(maxsize=2 * total_segments)
+    stop = threading.Event()
+
+    throttle = None
+    if rcu_cap:
+        scan_kwargs["ReturnConsumedCapacity"] = "TOTAL"
+        throttle = RcuThrottle(rcu_cap, stop)
+    with ThreadPoolExecutor(max_workers=total_segments) as pool:
+        futures = [
+            pool.submit(scan_segment, client, scan_kwargs, seg,
+                        total_segments, pages, stop, throttle)
+            for seg in range(total_segments)
+        ]
+        try:
+            remaining = total_segments
+            while remaining:
+                try:
+                    page = pages.get(timeout=QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    # Un hilo que paró sin poder encolar su fin de segmento.
+                    if all(f.done() for f in futures) and pages.empty():
+                        break
+                    continue
+                if page is None:
+                    remaining -= 1
+                    continue
+                yield page
+        finally:
+            # Si el consumidor se detiene antes de tiempo (error, Ctrl-C o
+            # close()), los hilos ven `stop` y salen de put_page().
+            stop.set()
+    for fut in futures:
+        fut.result()        # propaga el error de un segmento, si lo hubo
+
+
+def track_headers(pages: Iterable[List[Dict[str, Any]]],
+                  headers: Set[str]) -> Iterator[List[Dict[str, Any]]]:
+    """Acumula en `headers` las columnas de cada página según pasa."""
+    for page in pages:
+        for it in page:
+            headers.update(it)
+        yield page
+
+
+def spool_pages(pages: Iterable[List[Dict[str, Any]]], fp: IO[bytes]) -> int:
+    """Vuelca cada página a `fp` con pickle; devuelve el nº de ítems."""
+    count = 0
+    for page in pages:
+        pickle.dump(page, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        count += len(page)
+    return count
+
+
+def iter_spooled(fp: IO[bytes]) -> Iterator[Dict[str, Any]]:
+    fp.seek(0)
+    while True:
+        try:
+            page = pickle.load(fp)
+        except EOFError:
+            return
+        yield from page
 
 
 # ------------------------- CSV helpers ------------------------- #
-def collect_headers(items: List[Dict[str, Any]]) -> List[str]:
-    cols: Set[str] = set()
+def write_csv(items: Iterable[Dict[str, Any]], headers: List[str],
+              delimiter: str, fp) -> int:
+    """Escribe cabecera + filas; devuelve el nº de filas escritas."""
+    writer = csv.writer(fp, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(headers)
+    headers_tuple = tuple(headers)
+    _ts = to_scalar
+    _get = dict.get
+    _writerows = writer.writerows
+    count = 0
+    batch: List[List[Any]] = []
+    _append = batch.append
+    for it in items:
+        _append([_ts(_get(it, h, "")) for h in headers_tuple])
+        if len(batch) >= CSV_BATCH_ROWS:
+            _writerows(batch)
+            count += len(batch)
+            batch.clear()
+    _writerows(batch)
+    return count + len(batch)
+
+
+def write_ndjson(items: Iterable[Dict[str, Any]], fp: IO[bytes]) -> int:
+    """Un ítem JSON por línea, directo en bytes; devuelve el nº de ítems."""
+    _encode = _encode_json
+    _write = fp.write
+    count = 0
     for it in items:
-        cols.update(it.keys())
-    return sorted(cols)
+        _write((_encode(it) + "\n").encode("utf-8"))
+        count += 1
+    return count
 
 
-def write_csv(items: List[Dict[str, Any]], headers: List[str],
-              delimiter: str, fp):
-    writer = csv.DictWriter(fp, fieldnames=headers,
-                            delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
-    writer.writeheader()
-    for it in items:
-        row = {h: to_scalar(it.get(h, "")) for h in headers}
-        writer.writerow(row)
+def export_items(items: Iterable[Dict[str, Any]], headers: List[str],
+                 args: argparse.Namespace) -> int:
+    if args.ndjson:
+        if args.stdout:
+            return write_ndjson(items, sys.stdout.buffer)
+        with open(f"{args.table}.ndjson", "wb") as fb:
+            return write_ndjson(items, fb)
+
+    if args.stdout:
+        return write_csv(items, headers, args.delimiter, sys.stdout)
+    outfile = f"{args.table}.csv"
+    with open(outfile, "w", newline='', encoding="utf-8") as f:
+        return write_csv(items, headers, args.delimiter, f)
 
 
 # ------------------------- main ------------------------- #
@@ -166,26 +608,74 @@ def main() -> None:
 
     dynamodb = get_dynamodb_resource(args.profile, args.region)
 
+    # Con --columns solo se piden esos atributos (más el de orden, que hace
+    # falta localmente) y las cabeceras se conocen de antemano.
+    columns = parse_columns(args.columns) if args.columns else None
+    projection = columns
+    if columns and args.order != "none" and args.sort_by not in columns:
+        projection = columns + [args.sort_by]
+
     try:
-        items = scan_table(args.table, args.date_attr, start_ts, end_ts, dynamodb)
+        index_kwargs = None
+        partition = None
+        if args.partition:
+            table = dynamodb.Table(args.table)
+            try:
+                partition = typed_partition(table, args.partition)
+            except ValueError as exc:
+                print(f"❌  {exc}", file=sys.stderr)
+                sys.exit(1)
+            index_kwargs = query_index(table, args.partition[0], args.date_attr)
+            if index_kwargs is None:
+                print(f"⚠️  «{args.date_attr}» no es sort key de un índice con "
+                      f"partition key «{args.partition[0]}»; se usa Scan "
+                      "filtrando por la partición.", file=sys.stderr)
+            elif args.segments or args.rcu_cap:
+                print("⚠️  --segments y --rcu-cap solo aplican al Scan; "
+                      "se ignoran con Query.", file=sys.stderr)
+
+        if index_kwargs is not None:
+            scan_pages = iter_query(table, index_kwargs, partition,
+                                    args.date_attr, start_ts, end_ts, projection)
+        else:
+            scan_pages = iter_scan(args.table, args.date_attr, start_ts, end_ts,
+                                   dynamodb, args.segments, projection,
+                                   args.rcu_cap, partition)
+
+        # closing(): si la escritura falla (p. ej. BrokenPipe) o se
+        # interrumpe, el generador se cierra y los hilos del Scan paran.
+        with closing(scan_pages) as pages:
+            # Sin --columns, las cabeceras del CSV se recogen según llegan las
+            # páginas, sin otra pasada. NDJSON no las necesita.
+            cols: Set[str] = set()
+            if not columns and not args.ndjson:
+                pages = track_headers(pages, cols)
+            if args.order == "none" and (columns or args.ndjson):
+                # Nada que esperar: se escribe directamente según llega.
+                count = export_items((it for page in pages for it in page), columns, args)
+            elif args.order == "none":
+                with tempfile.TemporaryFile() as spool:
+                    count = spool_pages(pages, spool)
+                    export_items(iter_spooled(spool), sorted(cols), args)
+            else:
+                items = [it for page in pages for it in page]
+
+                # Ordenar
+                sort_items(items, args.sort_by, reverse=args.order == "desc")
+                if args.ndjson and projection is not columns:
+                    # El atributo de orden solo se pidió para ordenar.
+                    for it in items:
+                        it.pop(args.sort_by, None)
+
+                count = len(items)
+                export_items(items, columns or sorted(cols), args)
     except dynamodb.meta.client.exceptions.ResourceNotFoundException:
         print(f"❌  La tabla «{args.table}» no existe.", file=sys.stderr)
         sys.exit(1)
 
-    # Ordenar
-    reverse = args.order == "desc"
-    #items.sort(key=lambda it: value_as_sort_key(it.get(args.sort_by)), reverse=reverse)
-    items.sort(key=lambda it: value_as_sort_key(it.get(args.sort_by)), reverse=reverse)
-
-    # CSV
-    headers = collect_headers(items)
-    if args.stdout:
-        write_csv(items, headers, args.delimiter, sys.stdout)
-    else:
-        outfile = f"{args.table}.csv"
-        with open(outfile, "w", newline='', encoding="utf-8") as f:
-            write_csv(items, headers, args.delimiter, f)
-        print(f"✅  {len(items)} ítems exportados en {outfile} (orden {args.order}).")
+    if not args.stdout:
+        ext = "ndjson" if args.ndjson else "csv"
+        print(f"✅  {count} ítems exportados en {args.table}.{ext} (orden {args.order}).")
 
 
 if __name__ == "__main__":
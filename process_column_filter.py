@@ -16,6 +16,14 @@ Ejemplo de uso:
 Parámetros opcionales:
     --ignore-missing  → si se pasa, no fallará cuando falten columnas,
                         simplemente las omite y avisa por stderr.
+
+    --engine arrow    → filtra con el lector/escritor CSV de pyarrow
+                        (pip install pyarrow), por lotes y en C++. Su salida
+                        no es idéntica a la del motor csv (por defecto):
+                        cabecera y valores van siempre entre comillas y las
+                        líneas terminan en LF en vez de CRLF. Si el archivo
+                        tiene filas irregulares (p. ej. con menos columnas)
+                        se avisa y se repite el filtrado con el motor csv.
 """
 
 import argparse
@@ -24,6 +32,15 @@ import os
 import sys
 from typing import List
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow es opcional
+    pa = None
+
+# Tamaño de bloque del lector CSV de pyarrow.
+ARROW_BLOCK_SIZE = 8 << 20
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -51,6 +68,12 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Si se indica, las columnas que no existan se ignoran en vez de abortar.",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["csv", "arrow"],
+        default="csv",
+        help="Motor de filtrado: csv (estándar, por defecto) o arrow (pyarrow).",
+    )
     return parser.parse_args()
 
 
@@ -76,39 +99,81 @@ def filter_csv(
     out_path: str,
     columns_to_keep: List[str],
     ignore_missing: bool = False,
+    engine: str = "csv",
 ) -> None:
+    if engine == "arrow" and pa is None:
+        raise ValueError("--engine arrow requiere pyarrow (pip install pyarrow).")
     if not os.path.isfile(in_path):
         raise FileNotFoundError(f"Archivo de entrada no encontrado: {in_path}")
 
     with open(in_path, newline="", encoding="utf-8") as infile:
-        reader = csv.DictReader(infile)
-        existing_cols = reader.fieldnames or []
+        existing_cols = next(csv.reader(infile), [])
 
-        # Validación de columnas
-        missing = [col for col in columns_to_keep if col not in existing_cols]
-        if missing and not ignore_missing:
-            raise ValueError(
-                f"Las siguientes columnas no existen en el CSV de entrada:\n{missing}"
-            )
-        elif missing and ignore_missing:
+    # Validación de columnas
+    missing = [col for col in columns_to_keep if col not in existing_cols]
+    if missing and not ignore_missing:
+        raise ValueError(
+            f"Las siguientes columnas no existen en el CSV de entrada:\n{missing}"
+        )
+    elif missing and ignore_missing:
+        sys.stderr.write(
+            f"[Advertencia] Se ignorarán columnas inexistentes: {missing}\n"
+        )
+        columns_to_keep = [c for c in columns_to_keep if c in existing_cols]
+
+    if not columns_to_keep:
+        raise ValueError("No quedan columnas válidas para exportar.")
+
+    # Crear directorio de salida si no existe
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    if engine == "arrow":
+        try:
+            _filter_csv_arrow(in_path, out_path, columns_to_keep)
+            return
+        except pa.ArrowInvalid as exc:
             sys.stderr.write(
-                f"[Advertencia] Se ignorarán columnas inexistentes: {missing}\n"
+                f"[Advertencia] pyarrow no pudo leer el CSV ({exc}); "
+                "se usa el motor csv.\n"
             )
-            columns_to_keep = [c for c in columns_to_keep if c in existing_cols]
+    _filter_csv_stdlib(in_path, out_path, columns_to_keep)
+
 
-        if not columns_to_keep:
-            raise ValueError("No quedan columnas válidas para exportar.")
+def _filter_csv_arrow(in_path: str, out_path: str, columns: List[str]) -> None:
+    """
+    Lee y escribe por lotes con pyarrow.csv; solo se parsean las columnas
+    pedidas. Todas se leen como string para no alterar los valores
+    (p. ej. ceros a la izquierda) al inferir tipos. La entrada se mapea en
+    memoria (sin copias al buffer de lectura) en bloques de 8 MB.
+    El formato de salida es el de Arrow: todo entre comillas y fin de
+    línea LF.
+    """
+    with pa.memory_map(in_path) as source:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns,
+                column_types={col: pa.string() for col in columns},
+            ),
+        )
+        write_options = pa_csv.WriteOptions(quoting_style="needed")
+        with pa_csv.CSVWriter(out_path, reader.schema, write_options=write_options) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
 
-        # Crear directorio de salida si no existe
-        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
 
-        with open(out_path, "w", newline="", encoding="utf-8") as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=columns_to_keep)
-            writer.writeheader()
+def _filter_csv_stdlib(in_path: str, out_path: str, columns: List[str]) -> None:
+    with open(in_path, newline="", encoding="utf-8") as infile, \
+            open(out_path, "w", newline="", encoding="utf-8") as outfile:
+        reader = csv.DictReader(infile)
+        writer = csv.DictWriter(outfile, fieldnames=columns)
+        writer.writeheader()
 
-            for row in reader:
-                filtered_row = {col: row.get(col, "") for col in columns_to_keep}
-                writer.writerow(filtered_row)
+        for row in reader:
+            filtered_row = {col: row.get(col, "") for col in columns}
+            writer.writerow(filtered_row)
 
 
 def main() -> None:
@@ -121,6 +186,7 @@ def main() -> None:
             out_path=args.output,
             columns_to_keep=columns,
             ignore_missing=args.ignore_missing,
+            engine=args.engine,
         )
         print(f"Archivo generado correctamente en: {args.output}")
     except Exception as exc: